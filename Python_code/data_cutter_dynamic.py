@@ -2,13 +2,14 @@ import os
 import librosa
 import soundfile as sf
 from tqdm import tqdm
+from dataset_scanner import scan_dataset, valid_files
 import pandas as pd
 
-def get_audio_files(path):
-    """Returns a list of paths to audio files in the given directory."""
-    audio_extensions = ['.wav', '.mp3', '.flac', '.ogg', '.m4a']
-    audio_files = [os.path.join(path, f) for f in os.listdir(path) if os.path.splitext(f)[1] in audio_extensions]
-    return audio_files
+def get_audio_files(path, levels=False):
+    """Returns a list of paths to the valid audio files in the given directory, according to its manifest.
+    With levels=True the files are also decoded once to skip silent captures."""
+    entries, _ = scan_dataset(path, levels=levels)
+    return valid_files(entries)
 
 def calculate_segments(file_path, segment_length_ms):
     """Returns the number of segments of the specified length (in ms) that can be extracted from the given audio file."""
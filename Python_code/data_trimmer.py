@@ -1,13 +1,15 @@
 from pydub import AudioSegment
 import os
 from tqdm import tqdm
+from dataset_scanner import scan_dataset, valid_files
 
 def process_audio_files(input_directory, output_directory, fade_duration=10, sample_rate=48000):
     # Ensure the output directory exists
     os.makedirs(output_directory, exist_ok=True)
 
-    # Get a list of all audio files in the input directory
-    audio_files = [f for f in os.listdir(input_directory) if f.endswith('.wav') or f.endswith('.mp3')]
+    # Get the audio files in the input directory that have 144000 samples, from the headers in its manifest
+    entries, _ = scan_dataset(input_directory, extensions=['.wav', '.mp3'])
+    audio_files = [os.path.basename(f) for f in valid_files(entries, sample_rate=sample_rate, channels=1, frames=144000)]
 
     # Loop through all the files in the input directory with a progress bar
     for filename in tqdm(audio_files, desc="Processing audio files"):
@@ -0,0 +1,212 @@
+import os
+import csv
+import socket
+import struct
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+AUDIO_EXTENSIONS = ['.wav', '.mp3', '.flac', '.ogg', '.m4a']
+MANIFEST_NAME = 'dataset_manifest.csv'
+MANIFEST_COLUMNS = ['path', 'size', 'mtime', 'sample_rate', 'channels', 'frames', 'peak', 'rms', 'silent', 'error']
+
+def read_wav_header(file_path):
+    """Returns (sample_rate, channels, frames, error) read from the RIFF/RF64 header of a WAV file, without decoding it."""
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RF64') or riff[8:12] != b'WAVE':
+            return None, None, None, 'not a RIFF/WAVE file'
+
+        sample_rate = channels = block_align = None
+        ds64_data_size = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return sample_rate, channels, None, 'no data chunk'
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+
+            if chunk_id == b'ds64':
+                ds64 = f.read(16)
+                if chunk_size < 16 or len(ds64) < 16:
+                    return None, None, None, 'truncated ds64 chunk'
+                ds64_data_size = struct.unpack('<QQ', ds64)[1]
+                f.seek(chunk_size - 16 + (chunk_size & 1), 1)
+            elif chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                if len(fmt) < 16:
+                    return None, None, None, 'truncated fmt chunk'
+                _, channels, sample_rate, _, block_align, _ = struct.unpack('<HHIIHH', fmt[:16])
+                f.seek(chunk_size & 1, 1)
+            elif chunk_id == b'data':
+                if block_align is None or block_align == 0:
+                    return sample_rate, channels, None, 'data chunk before a valid fmt chunk'
+                if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                    chunk_size = ds64_data_size
+                available = file_size - f.tell()
+                frames = min(chunk_size, available) // block_align
+                if chunk_size > available:
+                    return sample_rate, channels, frames, f'truncated: header declares {chunk_size // block_align} frames'
+                return sample_rate, channels, frames, ''
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+def read_header(file_path):
+    """Returns (sample_rate, channels, frames, error) for any audio file, parsing WAV headers directly."""
+    if os.path.splitext(file_path)[1].lower() == '.wav':
+        return read_wav_header(file_path)
+    try:
+        info = sf.info(file_path)
+    except Exception as e:
+        return None, None, None, f'unreadable: {e}'
+    return info.samplerate, info.channels, info.frames, ''
+
+def measure_levels(file_path, block_size=65536):
+    """Returns the peak and RMS level of an audio file, reading it block by block."""
+    peak = 0.0
+    sum_squares = 0.0
+    num_samples = 0
+    for block in sf.blocks(file_path, blocksize=block_size, dtype='float32', always_2d=True):
+        if block.size == 0:
+            continue
+        peak = max(peak, float(np.max(np.abs(block))))
+        sum_squares += float(np.dot(block.ravel(), block.ravel()))
+        num_samples += block.size
+    rms = np.sqrt(sum_squares / num_samples) if num_samples else 0.0
+    return peak, float(rms)
+
+def scan_file(file_path, levels=False, silence_threshold=1e-3):
+    """Returns the manifest entry of a single audio file."""
+    stat = os.stat(file_path)
+    entry = {'path': file_path, 'size': stat.st_size, 'mtime': stat.st_mtime,
+             'sample_rate': None, 'channels': None, 'frames': None,
+             'peak': None, 'rms': None, 'silent': None, 'error': ''}
+    try:
+        entry['sample_rate'], entry['channels'], entry['frames'], entry['error'] = read_header(file_path)
+    except (OSError, struct.error) as e:
+        entry['error'] = f'unreadable: {e}'
+
+    if levels and not entry['error']:
+        try:
+            entry['peak'], entry['rms'] = measure_levels(file_path)
+            entry['silent'] = entry['peak'] < silence_threshold
+        except Exception as e:
+            entry['error'] = f'unreadable: {e}'
+    return entry
+
+def read_manifest(manifest_path):
+    """Returns the entries of a manifest CSV, or an empty list if it does not exist."""
+    if not os.path.exists(manifest_path):
+        return []
+
+    def parse(value, cast):
+        return cast(value) if value != '' else None
+
+    entries = []
+    with open(manifest_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            entries.append({
+                'path': row['path'],
+                'size': int(row['size']),
+                'mtime': float(row['mtime']),
+                'sample_rate': parse(row['sample_rate'], int),
+                'channels': parse(row['channels'], int),
+                'frames': parse(row['frames'], int),
+                'peak': parse(row['peak'], float),
+                'rms': parse(row['rms'], float),
+                'silent': parse(row['silent'], lambda v: v == 'True'),
+                'error': row['error'],
+            })
+    return entries
+
+def write_manifest(entries, manifest_path):
+    """Writes the entries to a manifest CSV. Several processes may write the same manifest, so it is replaced atomically."""
+    tmp_path = f'{manifest_path}.{socket.gethostname()}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        for entry in entries:
+            writer.writerow({k: ('' if v is None else repr(v) if isinstance(v, float) else v) for k, v in entry.items()})
+    os.replace(tmp_path, manifest_path)
+
+def scan_dataset(folder_path, manifest_path=None, levels=False, silence_threshold=1e-3, max_workers=8, extensions=AUDIO_EXTENSIONS):
+    """
+    Scan the audio files of a folder and update its manifest.
+
+    Files whose size and modification time match the previous manifest are not read again.
+    Threads are used since the work is file I/O and numpy reductions, which release the GIL.
+
+    :param folder_path: Path to the folder with the audio files.
+    :param manifest_path: Path to the manifest CSV (defaults to dataset_manifest.csv inside the folder).
+    :param levels: Whether to also decode the files to measure peak and RMS levels and flag silent files.
+    :param silence_threshold: Peak level (linear) below which a file is flagged as silent.
+    :param max_workers: Number of files scanned in parallel.
+    :param extensions: Audio file extensions to include.
+    :return: The list of manifest entries and a dict with the 'added', 'changed' and 'removed' paths since the last scan.
+    """
+    if manifest_path is None:
+        manifest_path = os.path.join(folder_path, MANIFEST_NAME)
+
+    audio_files = sorted(os.path.join(folder_path, f) for f in os.listdir(folder_path) if os.path.splitext(f)[1].lower() in extensions)
+    previous = {entry['path']: entry for entry in read_manifest(manifest_path)}
+
+    entries = {}
+    to_scan = []
+    for file_path in audio_files:
+        old = previous.get(file_path)
+        stat = os.stat(file_path)
+        if old is not None and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime and (old['peak'] is not None or old['error'] or not levels):
+            entries[file_path] = old
+        else:
+            to_scan.append(file_path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        scanned = executor.map(lambda p: scan_file(p, levels, silence_threshold), to_scan)
+        for entry in tqdm(scanned, total=len(to_scan), desc="Scanning audio files"):
+            entries[entry['path']] = entry
+
+    changes = {
+        'added': [p for p in to_scan if p not in previous],
+        'changed': [p for p in to_scan if p in previous and (previous[p]['size'] != entries[p]['size'] or previous[p]['mtime'] != entries[p]['mtime'])],
+        'removed': sorted(set(previous) - set(entries)),
+    }
+    entries = [entries[p] for p in audio_files]
+    write_manifest(entries, manifest_path)
+
+    num_errors = sum(1 for entry in entries if entry['error'])
+    print(f"Manifest {manifest_path}: {len(entries)} files, {len(changes['added'])} added, {len(changes['changed'])} changed, "
+          f"{len(changes['removed'])} removed since the last scan, {num_errors} invalid")
+    return entries, changes
+
+def entry_problem(entry, sample_rate=None, channels=None, frames=None, allow_silent=False):
+    """Returns why a manifest entry does not meet the requirements, or None if it does."""
+    if entry['error']:
+        return entry['error']
+    if sample_rate is not None and entry['sample_rate'] != sample_rate:
+        return f"sample rate {entry['sample_rate']} instead of {sample_rate}"
+    if channels is not None and entry['channels'] != channels:
+        return f"{entry['channels']} channels instead of {channels}"
+    if frames is not None and entry['frames'] != frames:
+        return f"{entry['frames']} frames instead of {frames}"
+    if not allow_silent and entry['silent']:
+        return 'silent'
+    return None
+
+def valid_files(entries, sample_rate=None, channels=None, frames=None, allow_silent=False):
+    """Returns the paths of the manifest entries that meet the requirements, printing why the others are skipped."""
+    files = []
+    for entry in entries:
+        problem = entry_problem(entry, sample_rate, channels, frames, allow_silent)
+        if problem is None:
+            files.append(entry['path'])
+        else:
+            print(f"Skipped file ({problem}): {entry['path']}")
+    return files
+
+if __name__ == '__main__':
+    # Example usage
+    folder_path = 'folder/path'
+    entries, changes = scan_dataset(folder_path, levels=True)
+    audio_files = valid_files(entries, sample_rate=48000, channels=1, frames=144000)
+    print(f'{len(audio_files)} of {len(entries)} files are valid')
@@ -3,10 +3,33 @@ import mido
 import numpy as np
 import pandas as pd
 import os
+import sys
+from functools import lru_cache
 from tqdm import tqdm
+from dataset_scanner import scan_dataset, valid_files
+from sharding import select_shard, partial_csv_path, finalize_csv
+from feature_quality import QUALITY_PRESETS
+
+# Columns of the feature CSVs, in the order features_to_dataframe writes them
+FEATURE_COLUMNS = (['file_name', 'Pitch (Hz)', 'Input delay (ms)', 'Spectral Centroid (Hz)', 'Spectral Bandwidth (Hz)',
+                   'Spectral Roll-off (Hz)', 'RMS Energy', 'Spectral Flatness']
+                   + [f'MFCCs_{i+1}' for i in range(13)]
+                   + [f'Spectral Contrast (dB)_{i+1}' for i in range(7)])
+
+# Mel filterbank, built once per setting instead of once per file and feature
+@lru_cache(maxsize=None)
+def mel_basis(sr, n_fft, n_mels):
+    basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    basis.flags.writeable = False
+    return basis
+
+# Mel power spectrogram from a power spectrogram, as librosa.feature.melspectrogram computes it
+def mel_spectrogram(S_power, sr, n_fft, n_mels=128):
+    return np.einsum("...ft,mf->...mt", S_power, mel_basis(sr, n_fft, n_mels), optimize=True)
 
 # Function to process MIDI and audio files, extract onsets, and calculate delays
-def process_midi_audio(midi_file, audio_file):
+# If y and sr are given, onsets are detected on that signal instead of reloading the file at its native rate
+def process_midi_audio(midi_file, audio_file, hop_length=512, y=None, sr=None):
     # Extract MIDI note onsets
     def extract_midi_onsets(midi_file):
         mid = mido.MidiFile(midi_file)
@@ -20,9 +43,16 @@ def process_midi_audio(midi_file, audio_file):
 
     # Extract audio onsets using Librosa
     def extract_audio_onsets(audio_file):
-        y, sr = librosa.load(audio_file, sr=None)
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr)
-        onsets = librosa.frames_to_time(onset_frames, sr=sr)
+        if y is None:
+            y_onsets, sr_onsets = librosa.load(audio_file, sr=None)
+            onset_frames = librosa.onset.onset_detect(y=y_onsets, sr=sr_onsets, hop_length=hop_length)
+        else:
+            # Same onset envelope as librosa's default, with the cached mel filterbank
+            sr_onsets = sr
+            S_power = np.abs(librosa.stft(y, n_fft=2048, hop_length=hop_length))**2
+            onset_envelope = librosa.onset.onset_strength(S=librosa.power_to_db(mel_spectrogram(S_power, sr, 2048)), sr=sr)
+            onset_frames = librosa.onset.onset_detect(onset_envelope=onset_envelope, sr=sr, hop_length=hop_length)
+        onsets = librosa.frames_to_time(onset_frames, sr=sr_onsets, hop_length=hop_length)
         return onsets
 
     # Calculate delay between MIDI and audio onsets
@@ -43,8 +73,8 @@ def process_midi_audio(midi_file, audio_file):
     return delay*1000
 
 # Pitch detection
-def detect_pitch(y, sr):
-    pitches, magnitudes = librosa.core.piptrack(y=y, sr=sr, fmin=75, fmax=16000)
+def detect_pitch(y, sr, n_fft=2048, hop_length=512, S=None):
+    pitches, magnitudes = librosa.core.piptrack(y=y, sr=sr, S=S, n_fft=n_fft, hop_length=hop_length, fmin=75, fmax=min(16000, sr / 2))
     # get indexes of the maximum value in each time slice
     max_indexes = np.argmax(magnitudes, axis=0)
     # get the pitches of the max indexes per time slice
@@ -53,20 +83,36 @@ def detect_pitch(y, sr):
     return pitch
 
 # Function to extract features from an audio file
-def extract_features(audio_path, midi_file, samplerate):
+# The quality preset ('exact', 'balanced' or 'fast') sets the resolution, see QUALITY_PRESETS
+def extract_features(audio_path, midi_file, samplerate, quality='exact'):
+    preset = QUALITY_PRESETS[quality]
+    n_fft, hop_length = preset['n_fft'], preset['hop_length']
 
-    delay = process_midi_audio(midi_file, audio_file)
     y, sr = librosa.load(audio_path, sr=samplerate)
+    if preset['onset_sr'] is None:
+        delay = process_midi_audio(midi_file, audio_path, hop_length=preset['onset_hop_length'])
+    else:
+        y_onsets = y if preset['onset_sr'] == sr else librosa.resample(y, orig_sr=sr, target_sr=preset['onset_sr'])
+        delay = process_midi_audio(midi_file, audio_path, hop_length=preset['onset_hop_length'], y=y_onsets, sr=preset['onset_sr'])
     y_trimmed, _ = librosa.effects.trim(y, top_db=10)
 
-    mfccs = librosa.feature.mfcc(y=y_trimmed, sr=sr, n_mfcc=13)
-    spectral_centroid = librosa.feature.spectral_centroid(y=y_trimmed, sr=sr)
-    spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y_trimmed, sr=sr)
-    spectral_contrast = librosa.feature.spectral_contrast(y=y_trimmed, sr=sr)
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y_trimmed, sr=sr)
-    rms = librosa.feature.rms(y=y_trimmed)
-    spectral_flatness = librosa.feature.spectral_flatness(y=y_trimmed)
-    pitch = detect_pitch(y_trimmed, sr)
+    # Compute the magnitude spectrogram once and share it between the spectral features
+    S = np.abs(librosa.stft(y_trimmed, n_fft=n_fft, hop_length=hop_length))
+    mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel_spectrogram(S**2, sr, n_fft, preset['n_mels'])), n_mfcc=13)
+    spectral_centroid = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=n_fft)
+    spectral_bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr, n_fft=n_fft)
+    spectral_rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr, n_fft=n_fft)
+    rms = librosa.feature.rms(y=y_trimmed, frame_length=n_fft, hop_length=hop_length)
+    spectral_flatness = librosa.feature.spectral_flatness(S=S)
+
+    spectral_contrast = librosa.feature.spectral_contrast(S=S, sr=sr, n_fft=n_fft)
+
+    # Pitch can run on a decimated signal
+    if preset['pitch_sr'] is None:
+        pitch = detect_pitch(y_trimmed, sr, n_fft=n_fft, hop_length=hop_length, S=S)
+    else:
+        y_pitch = librosa.resample(y_trimmed, orig_sr=sr, target_sr=preset['pitch_sr'])
+        pitch = detect_pitch(y_pitch, preset['pitch_sr'], n_fft=n_fft, hop_length=hop_length)
 
     features_dict = {
         'file_name': os.path.basename(audio_path),
@@ -83,8 +129,12 @@ def extract_features(audio_path, midi_file, samplerate):
 
     return features_dict
 
-# Function to save features to CSV
-def save_features_to_csv(features_list, csv_path):
+# Function to convert a list of features to a DataFrame with one column per value
+def features_to_dataframe(features_list):
+    # A shard can end up without files, it still gets a header-only table
+    if not features_list:
+        return pd.DataFrame(columns=FEATURE_COLUMNS)
+
     # Convert the list of features to a DataFrame
     df = pd.DataFrame(features_list)
     
@@ -102,26 +152,43 @@ def save_features_to_csv(features_list, csv_path):
     # Concatenate the new DataFrames
     df = pd.concat([df, mfccs_df, spectral_contrast_df], axis=1)
     
-    # Save to CSV
-    df.to_csv(csv_path, index=False)
-
-# Paths
-midi_file = 'MIDI_ref_note.mid'
-folder_path = 'folder/path'
+    return df
 
-# Get list of all audio files in the folder
-audio_files = [os.path.join(folder_path, file) for file in os.listdir(folder_path) if file.endswith('.wav')]
-
-# Extract features for all files and store them in a list
-all_features = []
-for audio_file in tqdm(audio_files):
-    features = extract_features(audio_file, midi_file, 48000)
-    if features is not None:
-        all_features.append(features)
-    # break
-
-# print(all_features)
-
-# Save features to CSV
-csv_path = 'audio_features_dynamic_wet.csv'
-save_features_to_csv(all_features, csv_path)
\ No newline at end of file
+# Function to save features to CSV
+def save_features_to_csv(features_list, csv_path):
+    df = features_to_dataframe(features_list)
+
+    # Save to CSV, moving it into place only once it is complete
+    df.to_csv(csv_path + '.tmp', index=False)
+    finalize_csv(csv_path + '.tmp', csv_path)
+
+if __name__ == '__main__':
+    # Paths
+    midi_file = 'MIDI_ref_note.mid'
+    quality = 'exact'  # 'exact', 'balanced' or 'fast', see QUALITY_PRESETS
+    folder_path = 'folder/path'
+
+    # Get list of all valid audio files in the folder from its manifest
+    entries, _ = scan_dataset(folder_path, extensions=['.wav'])
+    audio_files = valid_files(entries, sample_rate=48000)
+
+    # Sharding: pass "<shard index> <number of shards>" to only process part of the files, e.g.
+    # `python feature_extractor_dynamic.py 0 4`, then merge the partial CSVs with sharding.py
+    shard_index, num_shards = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (0, 1)
+    audio_files = select_shard(audio_files, shard_index, num_shards)
+
+    # Extract features for all files and store them in a list
+    all_features = []
+    for audio_file in tqdm(audio_files):
+        features = extract_features(audio_file, midi_file, 48000, quality)
+        if features is not None:
+            all_features.append(features)
+        # break
+
+    # print(all_features)
+
+    # Save features to CSV
+    csv_path = 'audio_features_dynamic_wet.csv'
+    if num_shards > 1:
+        csv_path = partial_csv_path(csv_path, shard_index, num_shards)
+    save_features_to_csv(all_features, csv_path)
@@ -0,0 +1,94 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+# Feature extraction settings per quality tier. 'exact' matches the librosa defaults used for the existing CSVs.
+# n_fft/hop_length: STFT used by all spectral features, n_mels: mel bands of the MFCCs,
+# pitch_sr: sample rate the signal is decimated to before pitch tracking (None keeps it),
+# onset_sr/onset_hop_length: onset detection behind the input delay, on the loaded signal decimated to onset_sr
+# (None reloads the file at its native rate, as the original extraction did).
+# Fewer mel bands or a shorter n_fft shift the MFCCs by tens of dB for little speed-up, and decimating before
+# spectral contrast moves its top band (12.8 kHz to Nyquist), so the presets keep those at the exact settings.
+QUALITY_PRESETS = {
+    'exact': {'n_fft': 2048, 'hop_length': 512, 'n_mels': 128, 'pitch_sr': None, 'onset_sr': None, 'onset_hop_length': 512},
+    'balanced': {'n_fft': 2048, 'hop_length': 1024, 'n_mels': 128, 'pitch_sr': 24000, 'onset_sr': 48000, 'onset_hop_length': 512},
+    'fast': {'n_fft': 2048, 'hop_length': 2048, 'n_mels': 128, 'pitch_sr': 16000, 'onset_sr': 16000, 'onset_hop_length': 256},
+}
+
+def reference_subset(reference_csv, audio_folder, num_files, seed=42):
+    """Returns a random subset of the reference CSV rows whose audio file exists in audio_folder, with their paths."""
+    reference_df = pd.read_csv(reference_csv)
+    exists = reference_df['file_name'].map(lambda f: os.path.exists(os.path.join(audio_folder, f)))
+    reference_df = reference_df[exists]
+    if len(reference_df) == 0:
+        raise ValueError(f"None of the files in {reference_csv} were found in {audio_folder}.")
+
+    reference_df = reference_df.sample(n=min(num_files, len(reference_df)), random_state=seed).sort_values('file_name')
+    audio_files = [os.path.join(audio_folder, f) for f in reference_df['file_name']]
+    return reference_df.reset_index(drop=True), audio_files
+
+def quality_error_report(reference_df, audio_files, midi_file, extract_features, features_to_dataframe, quality, samplerate=48000):
+    """
+    Measure the per-column error of a quality preset against the 'exact' preset.
+
+    Both presets are run on the same files, so the error only comes from the preset. The stored CSV values can differ
+    from the 'exact' output (e.g. the dry delay is hard-coded to 0, or another librosa version was used), so they are
+    only reported as a separate sanity column.
+
+    :param reference_df: Features stored in a CSV for the audio files, e.g. from reference_subset().
+    :param audio_files: Paths to the audio files, in the same order as reference_df.
+    :param midi_file: Path to the reference MIDI note.
+    :param extract_features: Feature extraction function taking (audio_path, midi_file, samplerate, quality).
+    :param features_to_dataframe: Function turning a list of feature dicts into a DataFrame like the CSVs.
+    :param quality: Name of the preset to evaluate (a key of QUALITY_PRESETS).
+    :param samplerate: Sample rate the files are loaded at.
+    :return: DataFrame with the mean/max absolute error and the relative error (%) of every feature column against
+             'exact', plus the mean absolute difference between 'exact' and the CSV, and the speed-up of the preset.
+    """
+    # Warm up both presets first (lazy imports, JIT compilation, resampling filters), so timings don't depend on call order
+    for preset in ['exact', quality]:
+        extract_features(audio_files[0], midi_file, samplerate, quality=preset)
+
+    timings = {}
+    results = {}
+    for preset in ['exact', quality]:
+        start = time.perf_counter()
+        features_list = [extract_features(f, midi_file, samplerate, quality=preset) for f in tqdm(audio_files, desc=f"Extracting ({preset})")]
+        timings[preset] = time.perf_counter() - start
+        results[preset] = features_to_dataframe(features_list)
+
+    exact_df = results['exact']
+    preset_df = results[quality]
+    columns = [c for c in exact_df.columns if c != 'file_name']
+    report = []
+    for column in columns:
+        exact = exact_df[column].to_numpy(dtype=float)
+        error = np.abs(preset_df[column].to_numpy(dtype=float) - exact)
+        scale = np.mean(np.abs(exact))
+        stored = reference_df[column].to_numpy(dtype=float) if column in reference_df.columns else np.full(len(exact), np.nan)
+        report.append({
+            'Feature': column,
+            'Mean abs error': np.mean(error),
+            'Max abs error': np.max(error),
+            'Relative error (%)': 100 * np.mean(error) / scale if scale > 0 else 0.0,
+            'Exact vs CSV mean abs diff': np.mean(np.abs(exact - stored)),
+        })
+
+    report_df = pd.DataFrame(report)
+    speedup = timings['exact'] / timings[quality]
+    print(f"Quality '{quality}' on {len(audio_files)} files: {timings[quality]:.1f} s vs {timings['exact']:.1f} s exact ({speedup:.2f}x faster)")
+    print(report_df.to_string(index=False))
+    return report_df, speedup
+
+if __name__ == '__main__':
+    from feature_extractor_dynamic import extract_features, features_to_dataframe
+
+    # Example usage: error of the 'fast' preset on 50 files of the wet dynamic dataset
+    reference_csv = 'audio_features_dynamic_wet.csv'
+    audio_folder = 'folder/path'
+    midi_file = 'MIDI_ref_note.mid'
+    reference_df, audio_files = reference_subset(reference_csv, audio_folder, num_files=50)
+    report_df, speedup = quality_error_report(reference_df, audio_files, midi_file, extract_features, features_to_dataframe, 'fast')
+    report_df.to_csv('quality_report_fast.csv', index=False)
@@ -0,0 +1,311 @@
+import time
+import tracemalloc
+import mido
+import numpy as np
+import soundfile as sf
+
+FRAME_FEATURE_NAMES = ['RMS Energy', 'Spectral Centroid (Hz)', 'Spectral Flatness', 'Pitch (Hz)', 'Onset strength']
+
+# Time of the first MIDI note onset, as in process_midi_audio
+def midi_onset_time(midi_file):
+    mid = mido.MidiFile(midi_file)
+    onset_time = 0
+    for msg in mid:
+        onset_time += msg.time
+        if msg.type == 'note_on' and msg.velocity > 0:
+            return onset_time
+    raise ValueError(f"No note onsets in MIDI file: {midi_file}")
+
+class RingBuffer:
+    """Fixed-size circular buffer of audio samples. It starts filled with zeros, like librosa's centered frames."""
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.total = 0  # Number of samples written since the start
+
+    def write(self, block):
+        """Appends a block of at most capacity samples."""
+        n = len(block)
+        if n > self.capacity:
+            raise ValueError(f"Block of {n} samples does not fit in a ring buffer of {self.capacity} samples.")
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        self.buffer[:n - first] = block[first:]
+        self.total += n
+
+    def read(self, out, end):
+        """Copies the len(out) samples ending at absolute sample position end into out."""
+        n = len(out)
+        if end > self.total or end - n < self.total - self.capacity:
+            raise ValueError(f"Samples {end - n} to {end} are no longer (or not yet) in the ring buffer.")
+        start = (end - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:] = self.buffer[:n - first]
+
+class OnlineFeatureMonitor:
+    """
+    Computes the features of feature_extractor_dynamic.py incrementally while audio is being captured.
+
+    Audio is pushed in blocks of any size with process(). Frames are the same as librosa's centered STFT frames
+    (n_fft=frame_length, hann window), and each one is computed as soon as its last sample arrives,
+    i.e. frame_length // 2 samples after its centre. Every buffer is allocated up front, so memory stays fixed
+    however long the session is; the FFT output is the only per-frame temporary.
+
+    on_frame(frame_index, features) receives a reused array ordered as FRAME_FEATURE_NAMES.
+    on_segment(features_dict) receives the mean features of each segment of segment_length_ms, plus the
+    input delay (ms) from the strongest onset relative to the MIDI note, the peak level and the clipped samples.
+    The input delay is NaN when no onset stands out, i.e. the strongest one is less than onset_threshold standard
+    deviations above the segment's mean onset strength, as for a steady tone.
+    """
+
+    def __init__(self, sr=48000, frame_length=2048, hop_length=512, segment_length_ms=3000, midi_file=None,
+                 fmin=75, fmax=16000, clip_threshold=0.999, onset_threshold=5.0, on_frame=None, on_segment=None):
+        self.sr = sr
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.segment_length = int((segment_length_ms / 1000) * sr)
+        self.midi_onset = midi_onset_time(midi_file) if midi_file is not None else 0.0
+        self.clip_threshold = clip_threshold
+        self.onset_threshold = onset_threshold
+        self.on_frame = on_frame
+        self.on_segment = on_segment
+
+        num_bins = frame_length // 2 + 1
+        self.ring = RingBuffer(frame_length + hop_length)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame_length) / frame_length)).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(frame_length, 1 / sr)
+        self.fmin_bin = max(1, int(np.ceil(fmin * frame_length / sr)))
+        self.fmax_bin = min(num_bins - 2, int(fmax * frame_length / sr))
+
+        self.frame = np.zeros(frame_length, dtype=np.float32)
+        self.windowed = np.zeros(frame_length, dtype=np.float32)
+        self.magnitude = np.zeros(num_bins)
+        self.power = np.zeros(num_bins)
+        self.log_power = np.zeros(num_bins)
+        self.prev_log_power = np.zeros(num_bins)
+        self.flux = np.zeros(num_bins)
+        self.abs_chunk = np.zeros(hop_length, dtype=np.float32)
+        self.clipped_mask = np.zeros(hop_length, dtype=bool)
+        self.zeros = np.zeros(hop_length, dtype=np.float32)
+        self.frame_features = np.zeros(len(FRAME_FEATURE_NAMES))
+
+        # Running sums of the frame features of the current segment
+        self.segment_sums = np.zeros(len(FRAME_FEATURE_NAMES))
+        self.segment_frames = 0
+        self.segment_onset_strength = -1.0
+        self.segment_onset_time = 0.0
+        # Onset strength statistics of the segment, without the zero padding at the end of the stream
+        self.segment_onset_sum = 0.0
+        self.segment_onset_sum_squares = 0.0
+        self.segment_onset_frames = 0
+        self.padding = False
+        # Sample statistics, indexed by segment parity since samples run up to half a frame ahead of the frames
+        self.segment_peak = np.zeros(2)
+        self.segment_clipped = np.zeros(2, dtype=np.int64)
+
+        self.frame_index = 0
+        self.segment_index = 0
+        self.next_frame_end = frame_length // 2
+
+    def process(self, block):
+        """Pushes a block of mono float samples and computes every frame it completes."""
+        pos = 0
+        n = len(block)
+        while pos < n:
+            # Chunks never straddle a hop or a segment boundary
+            sample_segment_end = (self.ring.total // self.segment_length + 1) * self.segment_length
+            size = min(self.hop_length, n - pos, sample_segment_end - self.ring.total)
+            chunk = block[pos:pos + size]
+            self._update_levels(chunk)
+            self.ring.write(chunk)
+            pos += size
+
+            while self.ring.total >= self.next_frame_end:
+                self.ring.read(self.frame, self.next_frame_end)
+                self._process_frame()
+                self.next_frame_end += self.hop_length
+
+    def finish(self):
+        """Flushes the end of the stream: pads it with zeros like librosa does and emits the last segment."""
+        end = self.ring.total
+        self._process_padding(end)
+        if self.segment_frames:
+            self._emit_segment()
+
+    def _process_padding(self, end):
+        # Computes the remaining frames whose centre lies at or before sample position end, as librosa does
+        self.padding = True
+        while self.next_frame_end - self.frame_length // 2 <= end:
+            while self.ring.total < self.next_frame_end:
+                self.ring.write(self.zeros[:min(self.hop_length, self.next_frame_end - self.ring.total)])
+            self.ring.read(self.frame, self.next_frame_end)
+            self._process_frame()
+            self.next_frame_end += self.hop_length
+
+    def _update_levels(self, chunk):
+        slot = (self.ring.total // self.segment_length) % 2
+        abs_chunk = self.abs_chunk[:len(chunk)]
+        np.abs(chunk, out=abs_chunk)
+        self.segment_peak[slot] = max(self.segment_peak[slot], abs_chunk.max())
+        clipped_mask = self.clipped_mask[:len(chunk)]
+        np.greater_equal(abs_chunk, self.clip_threshold, out=clipped_mask)
+        self.segment_clipped[slot] += np.count_nonzero(clipped_mask)
+
+    def _process_frame(self):
+        centre = self.frame_index * self.hop_length
+        if centre >= (self.segment_index + 1) * self.segment_length:
+            self._emit_segment()
+
+        np.multiply(self.frame, self.window, out=self.windowed)
+        np.abs(np.fft.rfft(self.windowed), out=self.magnitude)
+
+        # RMS energy of the unwindowed frame, as librosa.feature.rms
+        rms = np.sqrt(np.dot(self.frame, self.frame) / self.frame_length)
+
+        # Spectral centroid of the magnitude spectrum, as librosa.feature.spectral_centroid
+        total = self.magnitude.sum()
+        centroid = np.dot(self.freqs, self.magnitude) / total if total > 0 else 0.0
+
+        # Spectral flatness of the power spectrum, as librosa.feature.spectral_flatness
+        np.square(self.magnitude, out=self.power)
+        np.maximum(self.power, 1e-10, out=self.power)
+        np.log(self.power, out=self.log_power)
+        flatness = np.exp(self.log_power.mean()) / self.power.mean()
+
+        # Pitch of the strongest peak between fmin and fmax, with the parabolic interpolation of piptrack
+        i = self.fmin_bin + int(np.argmax(self.magnitude[self.fmin_bin:self.fmax_bin + 1]))
+        left, mid, right = self.magnitude[i - 1], self.magnitude[i], self.magnitude[i + 1]
+        curvature = 2 * mid - left - right
+        shift = 0.5 * (right - left) / curvature if curvature > 0 else 0.0
+        pitch = (i + shift) * self.sr / self.frame_length if mid > 0 else 0.0
+
+        # Onset strength as the mean positive change of the log power spectrum
+        np.subtract(self.log_power, self.prev_log_power, out=self.flux)
+        np.maximum(self.flux, 0, out=self.flux)
+        onset_strength = self.flux.mean() if self.frame_index > 0 else 0.0
+        self.log_power, self.prev_log_power = self.prev_log_power, self.log_power
+
+        features = self.frame_features
+        features[0], features[1], features[2], features[3], features[4] = rms, centroid, flatness, pitch, onset_strength
+        self.segment_sums += features
+        self.segment_frames += 1
+        if not self.padding:
+            self.segment_onset_sum += onset_strength
+            self.segment_onset_sum_squares += onset_strength * onset_strength
+            self.segment_onset_frames += 1
+            if onset_strength > self.segment_onset_strength:
+                self.segment_onset_strength = onset_strength
+                self.segment_onset_time = centre / self.sr - self.segment_index * self.segment_length / self.sr
+
+        if self.on_frame is not None:
+            self.on_frame(self.frame_index, features)
+        self.frame_index += 1
+
+    def _emit_segment(self):
+        slot = self.segment_index % 2
+        means = self.segment_sums / max(self.segment_frames, 1)
+
+        # Only report a delay when the strongest onset stands out from the rest of the segment
+        delay = float('nan')
+        if self.segment_onset_frames > 1:
+            onset_mean = self.segment_onset_sum / self.segment_onset_frames
+            onset_std = np.sqrt(max(self.segment_onset_sum_squares / self.segment_onset_frames - onset_mean ** 2, 0.0))
+            if onset_std > 0 and self.segment_onset_strength >= onset_mean + self.onset_threshold * onset_std:
+                delay = (self.segment_onset_time - self.midi_onset) * 1000
+        features_dict = {
+            'segment': self.segment_index,
+            'Pitch (Hz)': float(means[3]),
+            'Input delay (ms)': delay,
+            'Spectral Centroid (Hz)': float(means[1]),
+            'RMS Energy': float(means[0]),
+            'Spectral Flatness': float(means[2]),
+            'Peak': float(self.segment_peak[slot]),
+            'Clipped samples': int(self.segment_clipped[slot]),
+        }
+        if self.on_segment is not None:
+            self.on_segment(features_dict)
+
+        self.segment_sums[:] = 0
+        self.segment_frames = 0
+        self.segment_onset_strength = -1.0
+        self.segment_onset_time = 0.0
+        self.segment_onset_sum = 0.0
+        self.segment_onset_sum_squares = 0.0
+        self.segment_onset_frames = 0
+        self.segment_peak[slot] = 0
+        self.segment_clipped[slot] = 0
+        self.segment_index += 1
+
+def replay_file(audio_path, monitor, block_size=512, realtime=False):
+    """
+    Feeds an audio file to the monitor block by block, as a capture would.
+
+    Multichannel files are mixed down to mono like librosa.load. With realtime=False the file is replayed
+    as fast as possible, otherwise at its real-time rate.
+    """
+    info = sf.info(audio_path)
+    if info.samplerate != monitor.sr:
+        raise ValueError(f"Sample rate of {audio_path} is {info.samplerate}, the monitor expects {monitor.sr}.")
+
+    out = np.zeros((block_size, info.channels), dtype=np.float32)
+    mono = np.zeros(block_size, dtype=np.float32)
+    start = time.perf_counter()
+    played = 0
+    for block in sf.blocks(audio_path, always_2d=True, out=out):
+        n = len(block)
+        np.mean(block, axis=1, out=mono[:n])
+        monitor.process(mono[:n])
+        played += n
+        if realtime:
+            delay = played / monitor.sr - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+    monitor.finish()
+
+def benchmark(seconds=60, block_size=512, **monitor_args):
+    """Measures the monitor throughput and the worst time to process a block on a synthetic signal."""
+    monitor = OnlineFeatureMonitor(**monitor_args)
+    t = np.arange(block_size) / monitor.sr
+    block = np.zeros(block_size, dtype=np.float32)
+    num_blocks = int(seconds * monitor.sr / block_size)
+
+    # Warm up, then check that memory does not grow while processing
+    monitor.process(block)
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    worst_block_time = 0.0
+    start = time.perf_counter()
+    for i in range(num_blocks):
+        np.sin(2 * np.pi * 220 * (t + i * block_size / monitor.sr), out=block)
+        block_start = time.perf_counter()
+        monitor.process(block)
+        worst_block_time = max(worst_block_time, time.perf_counter() - block_start)
+    elapsed = time.perf_counter() - start
+    memory_growth = tracemalloc.get_traced_memory()[0] - memory_before
+    tracemalloc.stop()
+
+    results = {
+        'Audio (s)': num_blocks * block_size / monitor.sr,
+        'Processing (s)': elapsed,
+        'Real-time factor': num_blocks * block_size / monitor.sr / elapsed,
+        'Worst block (ms)': worst_block_time * 1000,
+        'Block budget (ms)': block_size / monitor.sr * 1000,
+        'Algorithmic latency (ms)': monitor.frame_length // 2 / monitor.sr * 1000,
+        'Memory growth (bytes)': memory_growth,
+    }
+    for name, value in results.items():
+        print(f'{name}: {value:.3f}')
+    return results
+
+if __name__ == '__main__':
+    # Example usage: replay a capture faster than real time and print every segment
+    audio_path = 'input/audio/path.wav'
+    midi_file = 'MIDI_ref_note.mid'
+    monitor = OnlineFeatureMonitor(sr=48000, midi_file=midi_file, on_segment=print)
+    replay_file(audio_path, monitor)
+
+    # Throughput benchmark
+    benchmark(seconds=60)
@@ -0,0 +1,138 @@
+import os
+import csv
+import sys
+import filecmp
+import hashlib
+import subprocess
+from dataset_scanner import scan_dataset, valid_files
+
+def shard_of(file_name, num_shards):
+    """Returns the shard (0 .. num_shards-1) a file belongs to, from a stable hash of its base name."""
+    digest = hashlib.md5(os.path.basename(file_name).encode('utf-8')).hexdigest()
+    return int(digest, 16) % num_shards
+
+def select_shard(audio_files, shard_index, num_shards):
+    """Returns the sorted subset of audio_files assigned to shard shard_index of num_shards."""
+    if num_shards < 1:
+        raise ValueError("The number of shards must be at least 1.")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index must be between 0 and {num_shards - 1}, got {shard_index}.")
+    return sorted(f for f in audio_files if shard_of(f, num_shards) == shard_index)
+
+def partial_csv_path(csv_path, shard_index, num_shards):
+    """Returns the path of the partial CSV written by one shard, e.g. 'features.shard-2-of-4.csv'."""
+    root, ext = os.path.splitext(csv_path)
+    return f'{root}.shard-{shard_index}-of-{num_shards}{ext}'
+
+def finalize_csv(tmp_path, csv_path):
+    """Moves a fully written CSV into place, so a crashed worker never leaves a partial file that looks complete."""
+    os.replace(tmp_path, csv_path)
+
+def read_csv_rows(csv_path):
+    """Returns the header line and a list of (file_name, raw line) for every row of a feature CSV."""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        lines = f.readlines()
+    if not lines:
+        raise ValueError(f"Empty CSV file: {csv_path}")
+    header = lines[0]
+    rows = []
+    for line in lines[1:]:
+        if not line.strip():
+            continue
+        file_name = next(csv.reader([line]))[0]
+        rows.append((file_name, line))
+    return header, rows
+
+def merge_partial_csvs(csv_path, num_shards, audio_files=None):
+    """
+    Merge the partial CSVs of all shards into csv_path.
+
+    Rows are copied verbatim and ordered by file name, which is the order a single-node run writes,
+    so the merged table is byte-identical to it.
+
+    :param csv_path: Path of the final CSV (the partial paths are derived from it).
+    :param num_shards: Number of shards the extraction was split into.
+    :param audio_files: Optional list of the audio files that should be in the table, to detect missing files.
+    :return: Number of rows written.
+    """
+    header = None
+    rows = {}
+    for shard_index in range(num_shards):
+        part_path = partial_csv_path(csv_path, shard_index, num_shards)
+        if not os.path.exists(part_path):
+            raise FileNotFoundError(f"Missing partial result for shard {shard_index} of {num_shards}: {part_path}")
+
+        part_header, part_rows = read_csv_rows(part_path)
+        if header is None:
+            header = part_header
+        elif part_header != header:
+            raise ValueError(f"Columns of {part_path} do not match the other shards.")
+
+        for file_name, line in part_rows:
+            if file_name in rows:
+                raise ValueError(f"Duplicate file '{file_name}' found in {part_path} and {rows[file_name][0]}.")
+            if shard_of(file_name, num_shards) != shard_index:
+                raise ValueError(f"File '{file_name}' in {part_path} does not belong to shard {shard_index}.")
+            rows[file_name] = (part_path, line)
+
+    if audio_files is not None:
+        expected = {os.path.basename(f) for f in audio_files}
+        missing = sorted(expected - set(rows))
+        unexpected = sorted(set(rows) - expected)
+        if missing:
+            raise ValueError(f"{len(missing)} files missing from the merged results, e.g. {missing[:5]}")
+        if unexpected:
+            raise ValueError(f"{len(unexpected)} unexpected files in the merged results, e.g. {unexpected[:5]}")
+
+    tmp_path = csv_path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        f.write(header)
+        for file_name in sorted(rows):
+            f.write(rows[file_name][1])
+    finalize_csv(tmp_path, csv_path)
+
+    return len(rows)
+
+def check_local_shards(extractor_script, csv_path, num_shards, audio_files=None):
+    """
+    Runs an extractor once on a single node and once as num_shards local processes, merges the shards
+    and checks that the merged CSV is byte-identical to the single-node one.
+
+    :param extractor_script: Extractor taking "<shard index> <number of shards>" arguments, e.g. feature_extractor_dynamic.py.
+    :param csv_path: Path of the CSV the extractor writes.
+    :param num_shards: Number of processes to run.
+    :param audio_files: Optional list of the audio files that should be in the table, passed to merge_partial_csvs.
+    :return: True if the merged CSV matches the single-node one.
+    """
+    root, ext = os.path.splitext(csv_path)
+    single_csv_path = f'{root}.single{ext}'
+    subprocess.run([sys.executable, extractor_script], check=True)
+    os.replace(csv_path, single_csv_path)
+
+    processes = [subprocess.Popen([sys.executable, extractor_script, str(i), str(num_shards)]) for i in range(num_shards)]
+    for shard_index, process in enumerate(processes):
+        if process.wait() != 0:
+            raise RuntimeError(f"Shard {shard_index} of {num_shards} failed with exit code {process.returncode}.")
+
+    num_rows = merge_partial_csvs(csv_path, num_shards, audio_files)
+    identical = filecmp.cmp(single_csv_path, csv_path, shallow=False)
+    print(f"{num_rows} rows from {num_shards} shards {'match' if identical else 'DO NOT match'} the single-node run ({single_csv_path})")
+    return identical
+
+if __name__ == '__main__':
+    # Merge the partial CSVs of N shards: `python sharding.py <number of shards> [csv path]`
+    # Or check sharding locally against a single-node run: `python sharding.py <number of shards> <csv path> <extractor script>`
+    num_shards = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else 'audio_features_dynamic_wet.csv'
+
+    # Input folder of the extraction, to detect missing files
+    folder_path = 'folder/path'
+    entries, _ = scan_dataset(folder_path, extensions=['.wav'])
+    audio_files = valid_files(entries, sample_rate=48000)
+
+    if len(sys.argv) > 3:
+        if not check_local_shards(sys.argv[3], csv_path, num_shards, audio_files):
+            sys.exit(1)
+    else:
+        num_rows = merge_partial_csvs(csv_path, num_shards, audio_files)
+        print(f'Merged {num_rows} rows from {num_shards} shards into {csv_path}')
@@ -2,6 +2,7 @@ import os
 import shutil
 import numpy as np
 from sklearn.model_selection import train_test_split
+from dataset_scanner import scan_dataset, valid_files
 
 def split_and_save_audio_files(parent_path, dry_folder, wet_folder, num_files, percentage_train, percentage_validation, seed):
     """
@@ -20,13 +21,21 @@ def split_and_save_audio_files(parent_path, dry_folder, wet_folder, num_files, p
     if percentage_train + percentage_validation != 100:
         raise ValueError("The sum of training and validation percentages must be 100.")
     
-    # Get list of files from both folders
-    dry_files = [os.path.join(dry_folder, f) for f in os.listdir(dry_folder) if f.endswith('.wav')]
-    wet_files = [os.path.join(wet_folder, f) for f in os.listdir(wet_folder) if f.endswith('.wav')]
+    # Get list of valid files from both folders, from their manifests
+    dry_entries, _ = scan_dataset(dry_folder, extensions=['.wav'])
+    wet_entries, _ = scan_dataset(wet_folder, extensions=['.wav'])
+    valid_dry = {os.path.basename(f) for f in valid_files(dry_entries)}
+    valid_wet = {os.path.basename(f) for f in valid_files(wet_entries)}
     
-    # Ensure both folders have the same number of files and enough files
-    if len(dry_files) != len(wet_files):
-        raise ValueError("The number of files in dry and wet folders must be the same.")
+    # Pair the files by name, keeping only the pairs that are valid in both folders
+    paired_names = sorted(valid_dry & valid_wet)
+    unpaired = len(valid_dry | valid_wet) - len(paired_names)
+    if unpaired:
+        print(f"Skipped {unpaired} files without a valid counterpart in the other folder.")
+    dry_files = [os.path.join(dry_folder, f) for f in paired_names]
+    wet_files = [os.path.join(wet_folder, f) for f in paired_names]
+    
+    # Ensure there are enough files
     if len(dry_files) < num_files:
         raise ValueError(f"Not enough files in the folders. Required: {num_files}, Available: {len(dry_files)}")
     